@@ -1,86 +1,187 @@
 import dash
 from dash import html, dcc, Output, Input, State
-import numpy as np
 import random
+import math
+import functools
 import gspread
+from gspread.utils import a1_to_rowcol, absolute_range_name, rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import os
 import json
-from oauth2client.service_account import ServiceAccountCredentials
+import logging
+import queue
+import atexit
+import threading
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; _solve falls back to the plain math kernel
+    njit = None
+
+# LOG_LEVEL is case-insensitive; unknown names fall back to WARNING
+_log_level = getattr(logging, os.environ.get("LOG_LEVEL", "WARNING").upper(), None)
+logging.basicConfig(level=_log_level if isinstance(_log_level, int) else logging.WARNING)
+logger = logging.getLogger(__name__)
 
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
 
+# Loaded once at import; with `gunicorn --preload` workers inherit it through fork()
 with open("google_credentials.json") as f:
     key_dict = json.load(f)
 
 creds = ServiceAccountCredentials.from_json_keyfile_dict(key_dict, scope)
 client = gspread.authorize(creds)
 
-# Open sheet
-sheet = client.open("STACK").sheet1  # assumes it's the first sheet
+# Keep-alive connection pool shared by every Sheets call; retries only connect
+# errors and idempotent requests, so appends are never duplicated
+client.session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.2),
+))
+
+# Connections opened by a preloading parent must not be shared with forked workers
+# (there is no fork() on Windows, so nothing to register there)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=client.session.close)
+
+# Headers expected on each worksheet
+ATTEMPT_HEADER = ["Timestamp", "Student ID", "F1", "F2", "F3", "Ans1", "Ans2", "Ans3", "Score", "Status", "ProblemID"]
+MAX_SCORE_HEADER = ["Student ID", "F1", "F2", "F3", "Ans1", "Ans2", "Ans3", "Max Score", "Last Updated"]
+
+def ensure_header(worksheet, header):
+    """Insert the header if the worksheet is empty, extend it with new columns, warn if it doesn't match"""
+    # Read the first row
+    existing_header = worksheet.row_values(1)
+
+    # If the sheet is empty or header doesn't match, insert header
+    if existing_header != header:
+        if len(existing_header) == 0:
+            worksheet.insert_row(header, 1)
+        elif header[:len(existing_header)] == existing_header:
+            # Older sheet without the newer trailing columns
+            worksheet.update("A1", [header])
+        else:
+            logger.warning("Existing header mismatch in %s. Header not overwritten.", worksheet.title)
+
+# Open sheets once at import; the handles are reused by every callback
+spreadsheet = client.open("STACK")
+sheet = spreadsheet.sheet1  # assumes it's the first sheet
+
+try:
+    max_sheet = spreadsheet.worksheet("MaxScores")
+except gspread.exceptions.WorksheetNotFound:
+    max_sheet = spreadsheet.add_worksheet(title="MaxScores", rows="100", cols="20")
+max_sheet_title = max_sheet.title
+
+ensure_header(sheet, ATTEMPT_HEADER)
+ensure_header(max_sheet, MAX_SCORE_HEADER)
 
 # Consistently define a single to_float helper function to use throughout the app
 def to_float(val):
     """Convert value to float, return None if it fails"""
+    if val is None or val == "":
+        return None
+    # Fast path: numbers from dcc.Input/dcc.Store need no try/except
+    if isinstance(val, (int, float)):
+        return float(val)
     try:
-        if val is None or val == "":
-            return None
         return float(val)
     except (ValueError, TypeError):
         return None
 
-def log_attempt(student_id, f1, f2, f3, a1, a2, a3, score):
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    row = [now, student_id, f1, f2, f3, a1, a2, a3, score]
+def append_attempts(rows):
+    """Append one or more attempt rows in a single Sheets API call"""
+    if not rows:
+        return
+    sheet.append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
 
-    # Define the expected header
-    header = ["Timestamp", "Student ID", "F1", "F2", "F3", "Ans1", "Ans2", "Ans3", "Score", "Status"]
+TIMESTAMP_FMT = "%Y-%m-%d %H:%M:%S"
 
-    # Read the first row
-    existing_header = sheet.row_values(1)
+def timestamp():
+    """Current local time in the sheet's timestamp format"""
+    return time.strftime(TIMESTAMP_FMT)
 
-    # If the sheet is empty or header doesn't match, insert header
-    if existing_header != header:
-        if len(existing_header) == 0:
-            sheet.insert_row(header, 1)
-        else:
-            print("Warning: Existing header mismatch. Header not overwritten.")
+def normalize_id(student_id):
+    return str(student_id).strip().lower()
+
+def log_attempt(student_id, f1, f2, f3, a1, a2, a3, score):
+    row = [timestamp(), student_id, f1, f2, f3, a1, a2, a3, score]
 
     # Append the student row
-    sheet.append_row(row)
+    enqueue_write(append_attempts, [row])
 
 app = dash.Dash(__name__)
 server = app.server
 app.title = "Resultant Force Calculator"
 
-# Utility to generate new force values and answers
-def generate_problem():
-    F1 = 350 + random.randint(0, 20)
-    F2 = 125 + random.randint(0, 15)
-    F3 = 200 + random.randint(0, 15)
+_COS30 = math.cos(math.radians(30))
+_SIN30 = math.sin(math.radians(30))
 
-    Ans1_A = np.sqrt(F2**2 + F3**2 - 2 * F2 * F3 * np.cos(np.deg2rad(30)))
-    IntTheta = np.rad2deg(np.arcsin(F2 * np.sin(np.deg2rad(30)) / Ans1_A))
-    Ans2_A = np.sqrt(Ans1_A**2 + F1**2 - 2 * Ans1_A * F1 * np.cos(np.deg2rad(60 - IntTheta)))
-    ResultantDeg = np.rad2deg(np.arcsin(Ans1_A * np.sin(np.deg2rad(60 - IntTheta)) / Ans2_A))
+def _solve_kernel(F1, F2, F3):
+    """Unrounded answers (F′, Fg, angle) for a set of forces"""
+    Ans1_A = math.sqrt(F2 * F2 + F3 * F3 - 2 * F2 * F3 * _COS30)
+    IntTheta = math.degrees(math.asin(F2 * _SIN30 / Ans1_A))
+    Ans2_A = math.sqrt(Ans1_A * Ans1_A + F1 * F1 - 2 * Ans1_A * F1 * math.cos(math.radians(60 - IntTheta)))
+    ResultantDeg = math.degrees(math.asin(Ans1_A * math.sin(math.radians(60 - IntTheta)) / Ans2_A))
     Ans3_A = 90 + 60 + ResultantDeg
 
-    # Ensure all answers are properly calculated and rounded
-    problem = {
+    return Ans1_A, Ans2_A, Ans3_A
+
+# JIT-compile the kernel when numba is installed; the compiled artifact is cached on disk
+if njit is not None:
+    _solve_kernel = njit(cache=True)(_solve_kernel)
+
+@functools.lru_cache(maxsize=8192)
+def _solve(F1, F2, F3):
+    """Compute the rounded answers (F′, Fg, angle) for a set of forces"""
+    Ans1_A, Ans2_A, Ans3_A = _solve_kernel(F1, F2, F3)
+    return float(round(Ans1_A, 3)), float(round(Ans2_A, 3)), float(round(Ans3_A, 3))
+
+def problem_from_forces(F1, F2, F3):
+    """Build the problem dict for the given forces (plain ints/floats, JSON-safe for dcc.Store)"""
+    F1, F2, F3 = int(F1), int(F2), int(F3)
+    Ans1, Ans2, Ans3 = _solve(F1, F2, F3)
+    return {
         "F1": F1,
         "F2": F2,
         "F3": F3,
-        "Ans1": round(Ans1_A, 3),
-        "Ans2": round(Ans2_A, 3),
-        "Ans3": round(Ans3_A, 3),
+        "Ans1": Ans1,
+        "Ans2": Ans2,
+        "Ans3": Ans3,
     }
+
+# ProblemID -> problem dict, filled lazily as drafts are restored
+_problems_by_id = {}
+
+def problem_id(F1, F2, F3):
+    """Encode the forces as a stable, collision-free ID (e.g. 350125200)"""
+    return int(F1) * 1_000_000 + int(F2) * 1_000 + int(F3)
+
+def problem_for_id(pid):
+    """Look up the problem for a ProblemID, decoding its forces on first use"""
+    problem = _problems_by_id.get(pid)
+    if problem is None:
+        F1, rest = divmod(pid, 1_000_000)
+        F2, F3 = divmod(rest, 1_000)
+        problem = _problems_by_id[pid] = problem_from_forces(F1, F2, F3)
+    return dict(problem)
+
+# Utility to generate new force values and answers
+def generate_problem():
+    F1 = 350 + random.randint(0, 20)
+    F2 = 125 + random.randint(0, 15)
+    F3 = 200 + random.randint(0, 15)
+
+    problem = problem_from_forces(F1, F2, F3)
     
     # Verify all problem data is properly generated
     for key in ["F1", "F2", "F3", "Ans1", "Ans2", "Ans3"]:
         if problem[key] is None:
-            print(f"Warning: {key} is None during problem generation!")
+            logger.warning("%s is None during problem generation!", key)
             # Use a default value instead of None
             if key.startswith("F"):
                 problem[key] = 200  # Default force value
@@ -89,58 +190,187 @@ def generate_problem():
     
     return problem
 
-def save_attempt(student_id, f1, f2, f3, a1, a2, a3, score, status):
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    row = [now, student_id, f1, f2, f3, a1, a2, a3, score, status]
+def attempt_row(student_id, f1, f2, f3, a1, a2, a3, score, status, now=None):
+    return [now or timestamp(), student_id, f1, f2, f3, a1, a2, a3, score, status, problem_id(f1, f2, f3)]
 
-    # Header as before
-    header = ["Timestamp", "Student ID", "F1", "F2", "F3", "Ans1", "Ans2", "Ans3", "Score", "Status"]
-    existing_header = sheet.row_values(1)
-    if existing_header != header:
-        if len(existing_header) == 0:
-            sheet.insert_row(header, 1)
+# Sheets writes run on a background thread so callbacks don't wait on the API.
+# The thread is started lazily per process, so it also exists in forked gunicorn workers.
+_write_q = queue.Queue()
+_writer_thread = None
+_writer_pid = None
+_writer_lock = threading.Lock()
 
-    sheet.append_row(row)
-
-def update_max_score(student_id, f1, f2, f3, a1, a2, a3, score):
-    try:
-        max_sheet = client.open("STACK").worksheet("MaxScores")
-    except gspread.exceptions.WorksheetNotFound:
-        max_sheet = client.open("STACK").add_worksheet(title="MaxScores", rows="100", cols="20")
+WRITE_ATTEMPTS = 3
+LOOKUP_WAIT = 5  # seconds a lookup waits for earlier writes to land
 
-    header = ["Student ID", "F1", "F2", "F3", "Ans1", "Ans2", "Ans3", "Max Score", "Last Updated"]
-    existing_header = max_sheet.row_values(1)
+def _is_rejected(exc):
+    """400 means Sheets refused the data itself; auth and quota errors are retried like any outage"""
+    if not isinstance(exc, gspread.exceptions.APIError):
+        return False
+    return exc.response.status_code == 400
 
-    if existing_header != header:
-        if not existing_header:
-            max_sheet.insert_row(header, 1)
+def append_with_retry(rows):
+    """Append rows, retrying transient failures; rows Sheets rejects are logged and dropped"""
+    for attempt in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            append_attempts(rows)
+            return
+        except Exception as exc:
+            if _is_rejected(exc):
+                if len(rows) > 1:
+                    # Write the rows one by one so a single bad row doesn't sink the batch
+                    for row in rows:
+                        append_with_retry([row])
+                else:
+                    logger.exception("❌ Sheets rejected attempt row, dropping it: %s", rows[0])
+                return
+            if attempt == WRITE_ATTEMPTS:
+                logger.exception("❌ Giving up on %s attempt rows after %s tries: %s", len(rows), attempt, rows)
+                return
+            logger.warning("⚠️ Writing %s attempt rows failed (try %s), retrying", len(rows), attempt)
+            time.sleep(2 ** attempt)
+
+def _drain():
+    while True:
+        jobs = [_write_q.get()]
+        # Take everything else already queued so its rows can share one append call
+        while True:
+            try:
+                jobs.append(_write_q.get_nowait())
+            except queue.Empty:
+                break
+
+        writes = [job for job in jobs if job is not None]
+        rows = [row for fn, args in writes if fn is append_attempts for row in args[0]]
+        if rows:
+            append_with_retry(rows)
+
+        for fn, args in writes:
+            if fn is append_attempts:
+                continue
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("❌ Background write %s failed", fn.__name__)
+
+        for _ in jobs:
+            _write_q.task_done()
+        if None in jobs:
+            return
 
-    all_records = max_sheet.get_all_records()
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+def enqueue_write(fn, *args):
+    """Run fn(*args) on the background writer thread"""
+    global _writer_thread, _writer_pid
+    if _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer_pid != os.getpid():
+                _writer_thread = threading.Thread(target=_drain, name="sheets-writer", daemon=True)
+                _writer_thread.start()
+                _writer_pid = os.getpid()
+    _write_q.put((fn, args))
+
+@atexit.register
+def _stop_writer():
+    """Write whatever is still queued before the process exits"""
+    if _writer_pid != os.getpid():
+        return  # nothing was queued in this process
+    _write_q.put(None)
+    if _writer_thread.is_alive():
+        _writer_thread.join(timeout=10)
+    else:
+        # No thread can be started at interpreter shutdown, so write here
+        _drain()
+
+def save_attempt(student_id, f1, f2, f3, a1, a2, a3, score, status, now=None):
+    row = attempt_row(student_id, f1, f2, f3, a1, a2, a3, score, status, now)
+
+    enqueue_write(append_attempts, [row])
+
+def find_latest_attempt(student_id):
+    """Return the student's most recent attempt as a dict, or None if there is none"""
+    key = normalize_id(student_id)
+    if _writer_pid == os.getpid():
+        # Wait for the writes queued so far so the lookup sees this student's latest attempt,
+        # but not for ones other users queue meanwhile, and not forever if Sheets is slow
+        flushed = threading.Event()
+        enqueue_write(flushed.set)
+        if not flushed.wait(timeout=LOOKUP_WAIT):
+            logger.warning("⚠️ Queued writes still pending after %ss, reading the sheet as it is", LOOKUP_WAIT)
+
+    # Attempts are appended in order, so the last matching row is the latest
+    ids = sheet.col_values(2)
+    matched_rows = [r for r, sid in enumerate(ids[1:], start=2) if normalize_id(sid) == key]  # start=2 because of header
+    logger.debug("👤 Found %s records for this student", len(matched_rows))
+    if not matched_rows:
+        return None
 
-    for idx, row in enumerate(all_records, start=2):  # start=2 because of header
-        if str(row["Student ID"]).strip().lower() == str(student_id).strip().lower():
-            if score > row["Max Score"]:
-                max_sheet.update(f"B{idx}:I{idx}", [[f1, f2, f3, a1, a2, a3, score, now]])
+    r = matched_rows[-1]
+    values = sheet.batch_get([f"A{r}:K{r}"])[0]
+    return dict(zip(ATTEMPT_HEADER, values[0] if values else []))
+
+# Student ID -> row number in MaxScores, built lazily from column A only
+_max_score_rows = None
+
+def load_max_score_rows():
+    """Index the MaxScores sheet by Student ID with a single column read"""
+    global _max_score_rows
+    _max_score_rows = {}
+    for idx, sid in enumerate(max_sheet.col_values(1)[1:], start=2):  # start=2 because of header
+        if sid:
+            _max_score_rows.setdefault(normalize_id(sid), idx)
+
+def read_max_score_row(idx):
+    """Student ID and stored Max Score of one MaxScores row, in a single call"""
+    values = max_sheet.get(f"A{idx}:H{idx}")
+    row = values[0] if values else []
+    sid = row[0] if row else ""
+    current = to_float(row[7]) if len(row) > 7 else None
+    return sid, current
+
+def update_max_score(student_id, f1, f2, f3, a1, a2, a3, score, now=None):
+    just_loaded = _max_score_rows is None
+    if just_loaded:
+        load_max_score_rows()
+
+    key = normalize_id(student_id)
+    now = now or timestamp()
+
+    idx = _max_score_rows.get(key)
+    row = read_max_score_row(idx) if idx is not None else None
+    moved = row is not None and normalize_id(row[0]) != key
+    if moved or (idx is None and not just_loaded):
+        # Another worker added this student, or MaxScores was sorted/edited since the index was built
+        load_max_score_rows()
+        idx = _max_score_rows.get(key)
+        row = read_max_score_row(idx) if idx is not None else None
+
+    if row is not None:
+        sid, current = row
+        if normalize_id(sid) != key:
+            logger.warning("⚠️ MaxScores row %s no longer holds %s; update skipped", idx, student_id)
             return
+        if current is None or score > current:
+            spreadsheet.values_update(
+                absolute_range_name(max_sheet_title, f"{rowcol_to_a1(idx, 2)}:{rowcol_to_a1(idx, 9)}"),
+                params={"valueInputOption": "RAW"},
+                body={"values": [[f1, f2, f3, a1, a2, a3, score, now]]},
+            )
+        return
 
-    # Not found → insert new row
+    # Still not found → insert new row and remember where it landed
     new_row = [student_id, f1, f2, f3, a1, a2, a3, score, now]
-    max_sheet.append_row(new_row)
+    res = max_sheet.append_rows([new_row], value_input_option="RAW", insert_data_option="INSERT_ROWS")
+    updated_range = res["updates"]["updatedRange"].split("!")[-1]
+    _max_score_rows[key] = a1_to_rowcol(updated_range.split(":")[0])[0]
 
 # Helper function
 def is_close(user, correct, tol=0.005):
-    """Check if user answer is close to correct answer within tolerance"""
-    try:
-        user_val = to_float(user)
-        if user_val is None:
-            return False
-        correct_val = to_float(correct)
-        if correct_val is None or correct_val == 0:
-            return user_val == 0
-        return abs(user_val - correct_val) / correct_val < tol
-    except (TypeError, ValueError, ZeroDivisionError):
+    """Check if user answer is close to correct answer within tolerance (both already floats)"""
+    if user is None:
         return False
+    if correct == 0:
+        return user == 0
+    return abs(user - correct) < tol * abs(correct)
 
 # App layout
 app.layout = html.Div([
@@ -157,7 +387,7 @@ app.layout = html.Div([
         }),
         
         html.Div([
-            dcc.Input(id='student-id', type='text', placeholder='Enter Student ID', style={'marginBottom': '10px'}),
+            dcc.Input(id='student-id', type='text', placeholder='Enter Student ID', debounce=True, style={'marginBottom': '10px'}),
 
             dcc.Store(id='problem-data'),
             dcc.Store(id='show-try-again', data=False),
@@ -198,32 +428,50 @@ app.layout = html.Div([
 ], style={'maxWidth': '900px', 'margin': '0 auto', 'padding': '20px'})
 
 
-# Display current forces
-@app.callback(
+# Display current forces (runs in the browser, no server round-trip)
+app.clientside_callback(
+    """
+    function(data) {
+        if (!data) {
+            return "";
+        }
+        const span = (children, style) => ({
+            namespace: 'dash_html_components', type: 'Span',
+            props: style ? {children: children, style: style} : {children: children}
+        });
+        const bold = {fontWeight: 'bold'};
+        return {
+            namespace: 'dash_html_components', type: 'Div',
+            props: {
+                children: [
+                    span("Given "),
+                    span(`𝐅₁ = ${data.F1} N, `, bold),
+                    span(`𝐅₂ = ${data.F2} N, `, bold),
+                    span(`𝐅₃ = ${data.F3} N`, bold),
+                ],
+                style: {fontSize: '18px', marginBottom: '10px'}
+            }
+        };
+    }
+    """,
     Output('force-display', 'children'),
     Input('problem-data', 'data')
 )
-def display_forces(data):
-    if data is None:
-        return ""
-    
-    return html.Div([
-        html.Span("Given "),
-        html.Span(f"𝐅₁ = {data['F1']} N, ", style={'fontWeight': 'bold'}),
-        html.Span(f"𝐅₂ = {data['F2']} N, ", style={'fontWeight': 'bold'}),
-        html.Span(f"𝐅₃ = {data['F3']} N", style={'fontWeight': 'bold'}),
-    ], style={'fontSize': '18px', 'marginBottom': '10px'})
 
 
-# Show or hide Try Again button
-@app.callback(
+# Show or hide Try Again button (runs in the browser)
+app.clientside_callback(
+    """
+    function(visible) {
+        if (visible) {
+            return {display: 'inline-block', marginLeft: '10px'};
+        }
+        return {display: 'none'};
+    }
+    """,
     Output('try-btn', 'style'),
     Input('show-try-again', 'data')
 )
-def toggle_try_again(visible):
-    if visible:
-        return {'display': 'inline-block', 'marginLeft': '10px'}
-    return {'display': 'none'}
 
 @app.callback(
     Output('feedback1', 'children'),
@@ -252,38 +500,29 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
 
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
     
-    print(f"🔄 Triggered by: {button_id}")
+    logger.debug("🔄 Triggered by: %s", button_id)
 
     # 🌐 Initial load
     if button_id == 'url':
-        print("🌍 Initial URL load - generating new problem")
+        logger.debug("🌍 Initial URL load - generating new problem")
         new_problem = generate_problem()
-        print(f"📊 New problem data: {new_problem}")
+        logger.debug("📊 New problem data: %s", new_problem)
         return '', '', '', new_problem, None, None, None, False, False, ''
 
     # 💾 Load draft on student ID input
     if button_id == 'student-id' and student_id:
         student_id = str(student_id).strip().lower()
-        print(f"🔍 Looking for student ID: {student_id}")
+        logger.debug("🔍 Looking for student ID: %s", student_id)
         
         try:
-            records = sheet.get_all_records()
-            print(f"📚 Found {len(records)} total records")
-
-            # Get all attempts sorted by timestamp (assumes appended order)
-            student_attempts = [
-                r for r in records
-                if str(r.get('Student ID', '')).strip().lower() == student_id
-            ]
-            print(f"👤 Found {len(student_attempts)} records for this student")
-
-            if not student_attempts:
-                print("❌ No saved attempts found for this student")
+            latest = find_latest_attempt(student_id)
+
+            if latest is None:
+                logger.debug("❌ No saved attempts found for this student")
                 return '', '', '', generate_problem(), None, None, None, False, False, "No saved attempt found."
 
-            latest = student_attempts[-1]
             status = str(latest.get("Status", "")).strip().lower()
-            print(f"📝 Latest attempt status: {status}")
+            logger.debug("📝 Latest attempt status: %s", status)
 
             # 🟢 Reload only if draft
             score = to_float(latest.get("Score", 0))
@@ -291,38 +530,26 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
             if status == "draft":
                 # Ensure we properly handle potentially missing values
                 try:
-                    print(f"📄 Raw draft data: {latest}")
-                    
-                    # Important: Calculate actual values based on the forces
-                    F1 = int(float(latest.get("F1", 0)))
-                    F2 = int(float(latest.get("F2", 0)))
-                    F3 = int(float(latest.get("F3", 0)))
-                    
-                    # First, calculate the expected answers based on the forces
-                    Ans1_A = np.sqrt(F2**2 + F3**2 - 2 * F2 * F3 * np.cos(np.deg2rad(30)))
-                    IntTheta = np.rad2deg(np.arcsin(F2 * np.sin(np.deg2rad(30)) / Ans1_A))
-                    Ans2_A = np.sqrt(Ans1_A**2 + F1**2 - 2 * Ans1_A * F1 * np.cos(np.deg2rad(60 - IntTheta)))
-                    ResultantDeg = np.rad2deg(np.arcsin(Ans1_A * np.sin(np.deg2rad(60 - IntTheta)) / Ans2_A))
-                    Ans3_A = 90 + 60 + ResultantDeg
+                    logger.debug("📄 Raw draft data: %s", latest)
                     
-                    # Create problem data with the stored values and calculated answers
-                    restored_problem = {
-                        "F1": F1,
-                        "F2": F2,
-                        "F3": F3,
-                        "Ans1": round(Ans1_A, 3),
-                        "Ans2": round(Ans2_A, 3),
-                        "Ans3": round(Ans3_A, 3),
-                    }
+                    pid = to_float(latest.get("ProblemID"))
+                    if pid is not None:
+                        restored_problem = problem_for_id(int(pid))
+                    else:
+                        # Rows saved before the ProblemID column existed
+                        F1 = int(float(latest.get("F1", 0)))
+                        F2 = int(float(latest.get("F2", 0)))
+                        F3 = int(float(latest.get("F3", 0)))
+                        restored_problem = problem_from_forces(F1, F2, F3)
                     
-                    print(f"📊 Restored problem with calculated answers: {restored_problem}")
+                    logger.debug("📊 Restored problem with calculated answers: %s", restored_problem)
                     
                     # Make sure all the answer values are properly converted to float or None
                     ans1_val = to_float(latest.get("Ans1"))
                     ans2_val = to_float(latest.get("Ans2"))
                     ans3_val = to_float(latest.get("Ans3"))
                     
-                    print(f"📊 Student answers: {ans1_val}, {ans2_val}, {ans3_val}")
+                    logger.debug("📊 Student answers: %s, %s, %s", ans1_val, ans2_val, ans3_val)
                     
                     return (
                         '', '', '', restored_problem,
@@ -330,8 +557,8 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                         False, False,
                         f"📝 Draft loaded for {student_id}."
                     )
-                except Exception as e:
-                    print(f"❌ Error restoring draft: {e}")
+                except Exception:
+                    logger.exception("❌ Error restoring draft")
                     # If any conversion errors occur, generate a new problem instead
                     return (
                         '', '', '', generate_problem(),
@@ -347,9 +574,9 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                 else:
                     feedback = f"ℹ️ Your last score was {score}/1.5. A new question has been generated."
 
-                print("🆕 Final submission found. Generating new problem.")
+                logger.debug("🆕 Final submission found. Generating new problem.")
                 new_problem = generate_problem()
-                print(f"📊 New problem data: {new_problem}")
+                logger.debug("📊 New problem data: %s", new_problem)
                 
                 return (
                     '', '', '', new_problem,
@@ -359,9 +586,9 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                 )
 
             # 🔴 Otherwise, load new problem
-            print("❓ Unknown status. Generating new problem.")
+            logger.debug("❓ Unknown status. Generating new problem.")
             new_problem = generate_problem()
-            print(f"📊 New problem data: {new_problem}")
+            logger.debug("📊 New problem data: %s", new_problem)
             
             return (
                 '', '', '', new_problem,
@@ -369,11 +596,11 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                 False, False, f"Previous attempt was final. New question generated."
             )
         
-        except Exception as e:
-            print(f"❌ Error in student ID lookup: {e}")
+        except Exception:
+            logger.exception("❌ Error in student ID lookup")
             # Fallback to new problem if any error occurs
             new_problem = generate_problem()
-            print(f"📊 Fallback new problem data: {new_problem}")
+            logger.debug("📊 Fallback new problem data: %s", new_problem)
             return (
                 '', '', '', new_problem,
                 None, None, None,
@@ -382,9 +609,9 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
 
     # ✅ Check answers
     if button_id == 'check-btn':
-        print("✅ Check button pressed")
-        print(f"📝 Answers submitted: a1={a1}, a2={a2}, a3={a3}")
-        print(f"🧩 Problem data: {data}")
+        logger.debug("✅ Check button pressed")
+        logger.debug("📝 Answers submitted: a1=%s, a2=%s, a3=%s", a1, a2, a3)
+        logger.debug("🧩 Problem data: %s", data)
         
         # Validate input values (entered by student)
         a1_val = to_float(a1)
@@ -392,7 +619,7 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
         a3_val = to_float(a3)
         
         if a1_val is None or a2_val is None or a3_val is None:
-            print("⚠️ Incomplete answers detected")
+            logger.debug("⚠️ Incomplete answers detected")
             return (
                 "⚠️ Please complete all fields.",
                 "", "", dash.no_update,
@@ -400,37 +627,22 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                 False, False, ""
             )
 
-        # Validate that problem has been generated properly
-        required_keys = ['Ans1', 'Ans2', 'Ans3', 'F1', 'F2', 'F3']
-        if not isinstance(data, dict) or not all(k in data and data[k] is not None for k in required_keys):
-            print("🚨 Incomplete or missing problem data:", data)
+        # Validate that problem has been generated properly (numbers as stored by problem_from_forces)
+        def has_numbers(keys):
+            return isinstance(data, dict) and all(isinstance(data.get(k), (int, float)) for k in keys)
+
+        if not has_numbers(['Ans1', 'Ans2', 'Ans3', 'F1', 'F2', 'F3']):
+            logger.warning("🚨 Incomplete or missing problem data: %s", data)
             
             # Regenerate based on the forces if possible
-            if isinstance(data, dict) and all(k in data and data[k] is not None for k in ['F1', 'F2', 'F3']):
-                print("🔄 Regenerating answers from existing forces")
-                F1 = int(data['F1'])
-                F2 = int(data['F2'])
-                F3 = int(data['F3'])
+            if has_numbers(['F1', 'F2', 'F3']):
+                logger.debug("🔄 Regenerating answers from existing forces")
                 
                 # Calculate answers based on the forces
-                Ans1_A = np.sqrt(F2**2 + F3**2 - 2 * F2 * F3 * np.cos(np.deg2rad(30)))
-                IntTheta = np.rad2deg(np.arcsin(F2 * np.sin(np.deg2rad(30)) / Ans1_A))
-                Ans2_A = np.sqrt(Ans1_A**2 + F1**2 - 2 * Ans1_A * F1 * np.cos(np.deg2rad(60 - IntTheta)))
-                ResultantDeg = np.rad2deg(np.arcsin(Ans1_A * np.sin(np.deg2rad(60 - IntTheta)) / Ans2_A))
-                Ans3_A = 90 + 60 + ResultantDeg
-                
-                # Update data with calculated answers
-                data = {
-                    "F1": F1,
-                    "F2": F2,
-                    "F3": F3,
-                    "Ans1": round(Ans1_A, 3),
-                    "Ans2": round(Ans2_A, 3),
-                    "Ans3": round(Ans3_A, 3),
-                }
-                print(f"📊 Regenerated problem data: {data}")
+                data = problem_from_forces(data['F1'], data['F2'], data['F3'])
+                logger.debug("📊 Regenerated problem data: %s", data)
             else:
-                print("🆕 Generating completely new problem")
+                logger.debug("🆕 Generating completely new problem")
                 return (
                     "⚠️ Something went wrong. Please reload the question.",
                     "", "", generate_problem(),
@@ -438,45 +650,39 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
                     False, False, ""
                 )
 
-        # Extract expected answers from problem data
-        try:
-            expected1 = float(data.get('Ans1'))
-            expected2 = float(data.get('Ans2'))
-            expected3 = float(data.get('Ans3'))
-            print(f"✓ Expected answers: {expected1}, {expected2}, {expected3}")
-        except (TypeError, ValueError) as e:
-            print(f"❌ Error extracting expected answers: {e}")
-            return (
-                "⚠️ Something went wrong. Please reload the question.",
-                "", "", generate_problem(),
-                None, None, None,
-                False, False, ""
-            )
+        # Expected answers are already floats in the stored problem data
+        expected1 = data['Ans1']
+        expected2 = data['Ans2']
+        expected3 = data['Ans3']
+        logger.debug("✓ Expected answers: %s, %s, %s", expected1, expected2, expected3)
 
         # Grading
-        f1 = "✅ Correct!" if is_close(a1_val, expected1) else f"❌ Incorrect. Expected ≈ {expected1:.3f} N"
-        f2 = "✅ Correct!" if is_close(a2_val, expected2) else f"❌ Incorrect. Expected ≈ {expected2:.3f} N"
-        f3 = "✅ Correct!" if is_close(a3_val, expected3) else f"❌ Incorrect. Expected ≈ {expected3:.3f}°"
+        ok1 = is_close(a1_val, expected1)
+        ok2 = is_close(a2_val, expected2)
+        ok3 = is_close(a3_val, expected3)
+
+        f1 = "✅ Correct!" if ok1 else f"❌ Incorrect. Expected ≈ {expected1:.3f} N"
+        f2 = "✅ Correct!" if ok2 else f"❌ Incorrect. Expected ≈ {expected2:.3f} N"
+        f3 = "✅ Correct!" if ok3 else f"❌ Incorrect. Expected ≈ {expected3:.3f}°"
 
-        score = 0
-        if is_close(a1_val, expected1): score += 0.5
-        if is_close(a2_val, expected2): score += 0.5
-        if is_close(a3_val, expected3): score += 0.5
+        score = 0.5 * (ok1 + ok2 + ok3)
 
-        print(f"📊 Grading results: {f1}, {f2}, {f3}, Score: {score}/1.5")
+        logger.debug("📊 Grading results: %s, %s, %s, Score: %s/1.5", f1, f2, f3, score)
 
         if student_id:
-            print(f"💾 Saving final attempt for student {student_id}")
-            save_attempt(student_id, data['F1'], data['F2'], data['F3'], a1_val, a2_val, a3_val, score, "final")
-            update_max_score(student_id, data['F1'], data['F2'], data['F3'], a1_val, a2_val, a3_val, score)
+            logger.debug("💾 Saving final attempt for student %s", student_id)
+            # One timestamp for both the attempt row and the MaxScores update
+            now = timestamp()
+            save_attempt(student_id, data['F1'], data['F2'], data['F3'], a1_val, a2_val, a3_val, score, "final", now)
+            enqueue_write(update_max_score, student_id, data['F1'], data['F2'], data['F3'], a1_val, a2_val, a3_val, score, now)
 
         return f1, f2, f3, data, a1, a2, a3, True, True, ""
 
     # 🔄 Try again
     if button_id == 'try-btn':
-        print("🔄 Try again button pressed - generating new problem")
+        logger.debug("🔄 Try again button pressed - generating new problem")
         new_problem = generate_problem()
-        print(f"📊 New problem data: {new_problem}")
+        logger.debug("📊 New problem data: %s", new_problem)
         return '', '', '', new_problem, None, None, None, False, False, ""
 
     raise dash.exceptions.PreventUpdate
@@ -494,12 +700,12 @@ def handle_all(check_clicks, try_clicks, pathname, student_id, a1, a2, a3, data)
 )
 def save_progress(n_clicks, student_id, a1, a2, a3, data):
     if not student_id or not data:
-        print("❌ Save failed: Missing student ID or problem data")
+        logger.warning("❌ Save failed: Missing student ID or problem data")
         return "Error Saving"
     
-    print(f"💾 Saving draft for student {student_id}")
-    print(f"📊 Current problem data: {data}")
-    print(f"📝 Student answers: a1={a1}, a2={a2}, a3={a3}")
+    logger.debug("💾 Saving draft for student %s", student_id)
+    logger.debug("📊 Current problem data: %s", data)
+    logger.debug("📝 Student answers: a1=%s, a2=%s, a3=%s", a1, a2, a3)
     
     # Use the to_float function for consistent conversion
     save_attempt(
@@ -512,7 +718,7 @@ def save_progress(n_clicks, student_id, a1, a2, a3, data):
     return "Saved!"
 
 
-# Run the app
+# Run the app (development only; see README for running under gunicorn)
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=False)
 